@@ -1,8 +1,22 @@
 import os
 from flask import Flask
+from sqlalchemy import event
 from .extensions import db
+from .maps import start_map_worker
 from .models import Trip, Response # Import models so they are registered
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record, use_wal=True):
+    cursor = dbapi_connection.cursor()
+    if use_wal:
+        # WAL lets readers run while a writer commits; not available in-memory
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=134217728")
+    cursor.close()
+
 def create_app():
     app = Flask(__name__)
     app.secret_key = os.environ.get("SECRET_KEY", "change-me")
@@ -13,6 +27,15 @@ def create_app():
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     db.init_app(app)
+    start_map_worker()
+
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            use_wal = db.engine.url.database not in (None, "", ":memory:")
+            event.listen(
+                db.engine, "connect",
+                lambda conn, record: _set_sqlite_pragmas(conn, record, use_wal),
+            )
 
     # Register Blueprints / Routes
     from .routes import main_bp
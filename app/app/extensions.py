@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+# Sessions are scoped to a request, so there is no need to expire (and
+# re-SELECT) loaded objects after a commit.
+db = SQLAlchemy(session_options={"expire_on_commit": False})
@@ -0,0 +1,99 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+from jinja2 import Environment
+
+logger = logging.getLogger(__name__)
+
+# Standalone Leaflet page equivalent to what folium.Map + folium.Marker produced.
+# Only the centre and the popup text differ between destinations, so the
+# template is compiled once instead of letting folium rebuild it per map.
+_MAP_TEMPLATE = Environment(autoescape=True).from_string("""<!DOCTYPE html>
+<html>
+<head>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"/>
+    <script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+    <style>
+        html, body { width: 100%; height: 100%; margin: 0; padding: 0; }
+        #map { position: absolute; top: 0; bottom: 0; right: 0; left: 0; }
+        .leaflet-container { font-size: 1rem; }
+    </style>
+</head>
+<body>
+    <div id="map"></div>
+</body>
+<script>
+    var center = [{{ lat|tojson }}, {{ lon|tojson }}];
+    var map = L.map("map", { center: center, zoom: 12, zoomControl: true, preferCanvas: false });
+    L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+        minZoom: 0,
+        maxZoom: 19,
+        attribution: "&copy; <a href=\\"https://www.openstreetmap.org/copyright\\">OpenStreetMap</a> contributors"
+    }).addTo(map);
+    L.marker(center).addTo(map).bindPopup({{ popup|e|tojson }}, { maxWidth: "100%" });
+</script>
+</html>
+""")
+
+def render_map(filepath, name, lat, lon):
+    """Write a single-marker map for a destination to ``filepath``.
+
+    The page is written to a temporary file and moved into place, so the
+    map only appears at ``filepath`` once it is complete.
+    """
+    html = _MAP_TEMPLATE.render(lat=lat, lon=lon, popup=name)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates owner-only files
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# Maps are rendered off the request path by a daemon thread per process.
+# Jobs are (filepath, name, lat, lon) tuples as accepted by render_map.
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+# Paths waiting in this process's queue, and paths whose render failed here;
+# neither is queued again, so a broken map is not retried on every page view.
+_queued = set()
+_failed = set()
+_state_lock = threading.Lock()
+
+def _work():
+    while True:
+        filepath, name, lat, lon = _jobs.get()
+        try:
+            if not os.path.exists(filepath):
+                render_map(filepath, name, lat, lon)
+        except Exception:
+            logger.exception("Rendering map %s failed", filepath)
+            with _state_lock:
+                _failed.add(filepath)
+        finally:
+            with _state_lock:
+                _queued.discard(filepath)
+            _jobs.task_done()
+
+def start_map_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="map-renderer", daemon=True)
+            _worker.start()
+
+def enqueue_maps(jobs):
+    with _state_lock:
+        for job in jobs:
+            filepath = job[0]
+            if filepath in _queued or filepath in _failed:
+                continue
+            _queued.add(filepath)
+            _jobs.put(job)
@@ -1,24 +1,41 @@
-from flask import Blueprint, render_template, request, jsonify, url_for
-from .models import Trip
+from flask import Blueprint, render_template, request, jsonify, url_for, abort, current_app
+from .models import Trip, json_loads
 from .extensions import db
 import time
 
 multiday_bp = Blueprint('multiday', __name__)
 
+# The itinerary is stored and served as the exact JSON text the client sent.
+# Typing the column as plain Text bypasses JSONText, so the document is never
+# decoded and re-encoded on its way through.
+_raw_multiday_data = db.type_coerce(Trip.multiday_data, db.Text)
+
 @multiday_bp.route("/trip/<trip_id>/multiday")
 def planner(trip_id):
-    trip = Trip.query.get_or_404(trip_id)
+    trip = db.session.get(Trip, trip_id) or abort(404)
     return render_template("multiday.html", trip=trip)
 
 @multiday_bp.route("/trip/<trip_id>/multiday/api/save", methods=["POST"])
 def save_itinerary(trip_id):
-    trip = Trip.query.get_or_404(trip_id)
-    data = request.json
-    trip.multiday_data = data
+    try:
+        data = request.get_data().decode("utf-8")
+        json_loads(data)
+    except ValueError:
+        abort(400)
+    result = db.session.execute(
+        db.update(Trip).where(Trip.id == trip_id)
+        .values({Trip.multiday_data: db.literal(data, db.Text)})
+    )
+    if result.rowcount == 0:
+        abort(404)
     db.session.commit()
     return jsonify({"status": "success"})
 
 @multiday_bp.route("/trip/<trip_id>/multiday/api/load", methods=["GET"])
 def load_itinerary(trip_id):
-    trip = Trip.query.get_or_404(trip_id)
-    return jsonify(trip.multiday_data)
+    row = db.session.execute(
+        db.select(_raw_multiday_data).where(Trip.id == trip_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return current_app.response_class(row[0] or "[]", mimetype="application/json")
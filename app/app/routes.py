@@ -1,10 +1,14 @@
 import os
 import uuid
-import folium
-import json
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, make_response
+from collections import Counter
+import re
+import time
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, make_response, g
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, selectinload
 from .extensions import db
 from .models import Trip, Response
+from .maps import enqueue_maps
 
 main_bp = Blueprint('main', __name__)
 
@@ -16,6 +20,11 @@ DEFAULT_SEASONS = [
     {"name": "Winter", "image": "images/winter.png"},
 ]
 
+MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
 # Legacy Cities constant for backward compatibility or defaults
 CITIES = {
     "paris": {"code": "paris", "name": "Paris", "src": "images/paris.html", "alt": "Map of Paris"},
@@ -24,28 +33,60 @@ CITIES = {
     "london": {"code": "london", "name": "London", "src": "images/london.html", "alt": "Map of London"},
 }
 
+# How long a missing destination map is left to the process that queued it
+MAP_RENDER_GRACE_SECONDS = 60
+
+# Anything but a (unicode) letter or digit becomes "_" in a destination slug
+_SLUG_INVALID_RE = re.compile(r"[\W_]")
+
+# The my_trips cookie holds trip ids (uuid4 hex) joined with ".", which needs
+# no quoting in a cookie. Splitting on any non-hex run also accepts cookies
+# written in the older JSON list format.
+_TRIP_ID_RE = re.compile(r"[0-9a-f]{32}")
+_TRIP_ID_SEP_RE = re.compile(r"[^0-9a-f]+")
+
+def _decode_trip_ids(cookie):
+    if not cookie:
+        return []
+    return [p for p in _TRIP_ID_SEP_RE.split(cookie) if _TRIP_ID_RE.fullmatch(p)]
+
+def _encode_trip_ids(ids):
+    return ".".join(ids)
+
+def _get_my_trip_ids():
+    """Trip ids from the my_trips cookie, decoded once per request."""
+    if "my_trip_ids" not in g:
+        g.my_trip_ids = _decode_trip_ids(request.cookies.get('my_trips'))
+    return g.my_trip_ids
+
+def _set_my_trip_ids(response, ids):
+    g.my_trip_ids = ids
+    response.set_cookie('my_trips', _encode_trip_ids(ids), max_age=60*60*24*365) # 1 year
+
 @main_bp.route("/")
 def home():
     # Privacy: Only show trips the user has created or visited (stored in cookie)
-    my_trips_cookie = request.cookies.get('my_trips')
-    my_trip_ids = []
-    if my_trips_cookie:
-        try:
-            my_trip_ids = json.loads(my_trips_cookie)
-        except:
-            my_trip_ids = []
+    my_trip_ids = _get_my_trip_ids()
     
     if my_trip_ids:
-        trips = Trip.query.filter(Trip.id.in_(my_trip_ids)).all()
+        trips = (Trip.query.options(load_only(Trip.id, Trip.name))
+                 .filter(Trip.id.in_(my_trip_ids)).all())
+        response_counts = dict(
+            db.session.query(Response.trip_id, func.count(Response.id))
+            .filter(Response.trip_id.in_(my_trip_ids))
+            .group_by(Response.trip_id)
+            .all()
+        )
     else:
         trips = []
+        response_counts = {}
 
     trip_list = []
     for t in trips:
         trip_list.append({
             "id": t.id,
             "name": t.name or f"Trip {t.id[:6]}",
-            "responses": len(t.responses),
+            "responses": response_counts.get(t.id, 0),
         })
     return render_template("home.html", trips=trip_list)
 
@@ -68,6 +109,8 @@ def create_trip():
         trip_id = uuid.uuid4().hex
         location_details = {}
         location_codes = []
+        maps_to_render = []
+        slug_counters = Counter()
         
         # Ensure destination folder exists (using current_app.root_path to locate static folder correctly)
         # We assume app/static structure
@@ -83,22 +126,23 @@ def create_trip():
                 lat, lon = float(lat_str), float(lon_str)
             except ValueError: continue
                 
-            base_slug = "".join(ch.lower() if ch.isalnum() else "_" for ch in name).strip("_")
-            slug = base_slug
-            counter = 1
+            base_slug = _SLUG_INVALID_RE.sub("_", name.lower()).strip("_")
+            # Resume numbering where the last duplicate of this name left off;
+            # the loop only runs again if a literal "name_N" was also entered
+            counter = slug_counters[base_slug]
+            slug = f"{base_slug}_{counter}" if counter else base_slug
             while slug in location_details:
-                slug = f"{base_slug}_{counter}"
                 counter += 1
+                slug = f"{base_slug}_{counter}"
+            slug_counters[base_slug] = counter + 1
             
-            m = folium.Map(location=[lat, lon], zoom_start=12)
-            folium.Marker(location=[lat, lon], popup=name).add_to(m)
             filename = f"{slug}.html"
-            filepath = os.path.join(dest_folder, filename)
-            m.save(filepath)
+            maps_to_render.append((os.path.join(dest_folder, filename), name, lat, lon))
             
             relative_src = os.path.join("images", "custom", trip_id, filename)
             location_details[slug] = {
-                "code": slug, "name": name, "src": relative_src, "alt": f"Map of {name}"
+                "code": slug, "name": name, "src": relative_src, "alt": f"Map of {name}",
+                "lat": lat, "lon": lon,
             }
             location_codes.append(slug)
 
@@ -120,26 +164,26 @@ def create_trip():
         )
         db.session.add(new_trip)
         db.session.commit()
+
+        # Maps are rendered in the background; plan_trip shows a placeholder until they exist
+        enqueue_maps(maps_to_render)
         
         # Cookie Logic: Add new trip to my_trips
         response = make_response(redirect(url_for("main.plan_trip", trip_id=trip_id)))
-        my_trips_cookie = request.cookies.get('my_trips')
-        try:
-            my_ids = json.loads(my_trips_cookie) if my_trips_cookie else []
-        except:
-            my_ids = []
-            
+        my_ids = _get_my_trip_ids()
         if trip_id not in my_ids:
-            my_ids.append(trip_id)
-            
-        response.set_cookie('my_trips', json.dumps(my_ids), max_age=60*60*24*365) # 1 year
+            my_ids = my_ids + [trip_id]
+        _set_my_trip_ids(response, my_ids)
         return response
 
     return render_template("create_trip.html", durations=DEFAULT_DURATIONS, seasons=DEFAULT_SEASONS)
 
 @main_bp.route("/trip/<trip_id>", methods=["GET", "POST"])
 def plan_trip(trip_id: str):
-    trip = Trip.query.get_or_404(trip_id)
+    # A GET aggregates all responses, so fetch them in one extra SELECT up front;
+    # a vote POST never reads them
+    load_options = [selectinload(Trip.responses)] if request.method == "GET" else []
+    trip = db.session.get(Trip, trip_id, options=load_options) or abort(404)
     
     # Logic to reconstruct allowed_locations
     if trip.location_details:
@@ -199,56 +243,65 @@ def plan_trip(trip_id: str):
         return redirect(url_for("main.plan_trip", trip_id=trip_id))
 
     # Aggregating stats for GET
-    response_summary = {"locations": {}, "durations": {}, "seasons": {}, "months": {}, "dates": {}}
+    response_summary = {k: Counter() for k in ("locations", "durations", "seasons", "months", "dates")}
     for resp in trip.responses:
-        loc = resp.location
-        response_summary["locations"][loc] = response_summary["locations"].get(loc, 0) + 1
-        dur = resp.duration
-        response_summary["durations"][dur] = response_summary["durations"].get(dur, 0) + 1
-        for s in resp.seasons:
-             response_summary["seasons"][s] = response_summary["seasons"].get(s, 0) + 1
+        response_summary["locations"][resp.location] += 1
+        response_summary["durations"][resp.duration] += 1
+        response_summary["seasons"].update(resp.seasons)
         
-        # Derive months
-        derived_months = []
+        # Derive months from the "YYYY-MM-DD" strings sent by the date picker
         for d in resp.dates:
-            try:
-                month_num = int(d.split("-")[1])
-                month_names = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-                m_name = month_names[month_num - 1]
-                derived_months.append(m_name)
-                response_summary["dates"][d] = response_summary["dates"].get(d, 0) + 1
-            except: continue
-        for m in derived_months:
-             response_summary["months"][m] = response_summary["months"].get(m, 0) + 1
-
-    sorted_locations = sorted(response_summary["locations"].items(), key=lambda x: x[1], reverse=True)
-    sorted_durations = sorted(response_summary["durations"].items(), key=lambda x: x[1], reverse=True)
-    sorted_seasons = sorted(response_summary["seasons"].items(), key=lambda x: x[1], reverse=True)
-    sorted_months = sorted(response_summary["months"].items(), key=lambda x: x[1], reverse=True)
-    sorted_dates = sorted(response_summary["dates"].items(), key=lambda x: x[1], reverse=True)
+            mm = d[5:7]
+            month_num = int(mm) if mm.isdigit() else 0
+            if 1 <= month_num <= 12:
+                response_summary["months"][MONTH_NAMES[month_num - 1]] += 1
+                response_summary["dates"][d] += 1
+
+    sorted_locations = response_summary["locations"].most_common()
+    sorted_durations = response_summary["durations"].most_common()
+    sorted_seasons = response_summary["seasons"].most_common()
+    sorted_months = response_summary["months"].most_common()
+    # Only the top five dates are shown, so skip sorting the full histogram
+    sorted_dates_top = response_summary["dates"].most_common(5)
     
     totals = {k: sum(v.values()) for k, v in response_summary.items()}
 
+    # Maps of a freshly created trip may still be rendering in the background.
+    # Only destinations with stored coordinates are rendered by us. A map still
+    # missing well after its folder was last touched is requeued, in case the
+    # process that owned the job died; younger ones are left to that process.
+    static_folder = os.path.join(current_app.root_path, "static")
+    pending_maps = set()
+    missing_maps = []
+    now = time.time()
+    for loc in allowed_locations:
+        if "lat" not in loc:
+            continue
+        filepath = os.path.join(static_folder, loc["src"])
+        if not os.path.exists(filepath):
+            pending_maps.add(loc["code"])
+            try:
+                stale = now - os.path.getmtime(os.path.dirname(filepath)) > MAP_RENDER_GRACE_SECONDS
+            except OSError:
+                stale = False
+            if stale:
+                missing_maps.append((filepath, loc["name"], loc["lat"], loc["lon"]))
+    enqueue_maps(missing_maps)
+
     resp = make_response(render_template(
         "plan_trip.html", trip=trip, allowed_locations=allowed_locations,
         allowed_durations=allowed_durations, all_durations=DEFAULT_DURATIONS,
         allowed_seasons=allowed_seasons, allowed_months=allowed_months,
         share_url=request.url, sorted_locations=sorted_locations,
         sorted_durations=sorted_durations, sorted_seasons=sorted_seasons,
-        sorted_months=sorted_months, sorted_dates=sorted_dates,
-        sorted_dates_top=sorted_dates[:5], totals=totals,
-        location_details=location_details_map
+        sorted_months=sorted_months,
+        sorted_dates_top=sorted_dates_top, totals=totals,
+        location_details=location_details_map, pending_maps=pending_maps
     ))
     
     # Cookie Logic: Add accessed trip to my_trips
-    my_trips_cookie = request.cookies.get('my_trips')
-    try:
-        my_ids = json.loads(my_trips_cookie) if my_trips_cookie else []
-    except:
-        my_ids = []
-        
+    my_ids = _get_my_trip_ids()
     if trip_id not in my_ids:
-        my_ids.append(trip_id)
-        resp.set_cookie('my_trips', json.dumps(my_ids), max_age=60*60*24*365)
+        _set_my_trip_ids(resp, my_ids + [trip_id])
 
     return resp
@@ -15,35 +15,43 @@ def migrate():
     app = create_app()
     with app.app_context():
         print(f"Migrating {len(data)} trips...")
+        existing_ids = set(db.session.scalars(
+            db.select(Trip.id).where(Trip.id.in_(list(data)))
+        ))
+
+        # Plain dicts skip building a mapped instance per row; the JSON
+        # columns are still encoded by their column type on insert.
+        trip_rows = []
+        response_rows = []
         for trip_id, trip_data in data.items():
-            if Trip.query.get(trip_id):
+            if trip_id in existing_ids:
                 print(f"Trip {trip_id} already exists, skipping.")
                 continue
 
-            # Create Trip
-            t = Trip(
-                id=trip_id,
-                name=trip_data.get("name", "Untitled"),
-                creator_name=trip_data.get("creator"),
-                durations=trip_data.get("durations", []),
-                seasons=trip_data.get("seasons", []),
-                locations=trip_data.get("locations", []),
-                location_details=trip_data.get("location_details", {})
-            )
-            db.session.add(t)
+            trip_rows.append({
+                "id": trip_id,
+                "name": trip_data.get("name", "Untitled"),
+                "creator_name": trip_data.get("creator"),
+                "durations": trip_data.get("durations", []),
+                "seasons": trip_data.get("seasons", []),
+                "locations": trip_data.get("locations", []),
+                "location_details": trip_data.get("location_details", {}),
+            })
             
-            # Create Responses
             for resp_data in trip_data.get("responses", []):
-                r = Response(
-                    trip_id=trip_id,
-                    participant_name=resp_data.get("name"),
-                    location=resp_data.get("location"),
-                    duration=resp_data.get("duration"),
-                    seasons=resp_data.get("seasons", []),
-                    dates=resp_data.get("dates", [])
-                )
-                db.session.add(r)
+                response_rows.append({
+                    "trip_id": trip_id,
+                    "participant_name": resp_data.get("name"),
+                    "location": resp_data.get("location"),
+                    "duration": resp_data.get("duration"),
+                    "seasons": resp_data.get("seasons", []),
+                    "dates": resp_data.get("dates", []),
+                })
         
+        # One-off bulk load: skip fsyncs, the source file can be re-imported
+        db.session.execute(db.text("PRAGMA synchronous=OFF"))
+        db.session.bulk_insert_mappings(Trip, trip_rows)
+        db.session.bulk_insert_mappings(Response, response_rows)
         db.session.commit()
         print("Migration complete.")
 
@@ -15,6 +15,8 @@ def upgrade():
         print("Column multiday_data added.")
     except sqlite3.OperationalError as e:
         print(f"Error (maybe column exists): {e}")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_response_trip_ts ON response (trip_id, timestamp)")
+    print("Index ix_response_trip_ts ensured.")
     conn.commit()
     conn.close()
 